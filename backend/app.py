@@ -11,6 +11,10 @@ import math
 import traceback
 import google.generativeai as genai
 
+from data_quality import clean_rows
+from price_spread import load_spread_engine
+from user_store import create_user_store, public_profile, UserExistsError
+
 from flask_apscheduler import APScheduler
 
 # -------------------------------------------------
@@ -101,9 +105,9 @@ else:
     print("⚠ GEMINI_API_KEY missing")
 
 # -------------------------------------------------
-# Fallback user store
+# User profile store (Firestore or local SQLite)
 # -------------------------------------------------
-users_db = {}
+user_store = create_user_store(db if firebase_available else None)
 
 # -------------------------------------------------
 # Static frontend
@@ -129,6 +133,9 @@ def register():
         location = data.get('location')
         farm_size = data.get('farmSize')
 
+        if not email or not password:
+            return jsonify({'success': False, 'error': 'Email and password are required'}), 400
+
         if firebase_available:
             user = auth.create_user(
                 email=email,
@@ -146,7 +153,7 @@ def register():
                 'createdAt': datetime.now()
             }
 
-            db.collection('users').document(user.uid).set(user_data)
+            user_store.create(user_data)
 
             return jsonify({
                 'success': True,
@@ -159,26 +166,23 @@ def register():
             })
 
         else:
-            if email in users_db:
+            try:
+                user = user_store.create({
+                    'email': email,
+                    'fullName': full_name,
+                    'location': location,
+                    'farmSize': farm_size,
+                    'userType': 'farmer',
+                    'createdAt': datetime.now().isoformat()
+                }, password)
+            except UserExistsError:
                 return jsonify({'success': False, 'error': 'User exists'}), 400
 
-            user_id = f"user_{len(users_db)+1}"
-            users_db[email] = {
-                'uid': user_id,
-                'email': email,
-                'password': password,
-                'fullName': full_name,
-                'location': location,
-                'farmSize': farm_size,
-                'userType': 'farmer',
-                'createdAt': datetime.now().isoformat()
-            }
-
             return jsonify({
                 'success': True,
                 'message': 'User registered (fallback)',
                 'user': {
-                    'uid': user_id,
+                    'uid': user['uid'],
                     'email': email,
                     'fullName': full_name
                 }
@@ -198,17 +202,16 @@ def login():
         email = data.get('email')
         password = data.get('password')
 
+        user = user_store.get_by_email(email)
+
         if firebase_available:
-            user_ref = db.collection('users').where('email', '==', email).limit(1).get()
-            if user_ref:
-                return jsonify({'success': True, 'user': user_ref[0].to_dict()})
+            if user:
+                return jsonify({'success': True, 'user': public_profile(user)})
             return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
 
         else:
-            if email in users_db and users_db[email]['password'] == password:
-                user = users_db[email].copy()
-                user.pop('password')
-                return jsonify({'success': True, 'user': user})
+            if user and user_store.check_password(user, password):
+                return jsonify({'success': True, 'user': public_profile(user)})
             return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
 
     except Exception as e:
@@ -246,15 +249,17 @@ def market_data():
         if df.empty:
             return jsonify({'success': False, 'error': 'No data found'}), 404
 
-        total_volume = df.get('quantity', pd.Series()).sum()
-        avg_price = df.get('price', pd.Series()).mean()
+        clean = clean_rows(df)
+        total_volume = clean.get('quantity', pd.Series()).sum()
+        avg_price = clean.get('price', pd.Series()).mean()
 
         return jsonify({
             'success': True,
             'data': {
                 'totalRecords': len(df),
-                'averagePrice': round(avg_price, 2),
-                'totalVolume': round(total_volume, 2),
+                'flaggedRecords': len(df) - len(clean),
+                'averagePrice': 0 if clean.empty else round(avg_price, 2),
+                'totalVolume': 0 if clean.empty else round(total_volume, 2),
                 'markets': df.to_dict('records'),
                 'lastUpdated': datetime.now().isoformat()
             }
@@ -264,6 +269,59 @@ def market_data():
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# -------------------------------------------------
+# Market spread / arbitrage
+# -------------------------------------------------
+@app.route('/api/market-spread')
+def market_spread():
+    try:
+        crop = request.args.get('crop', '')
+        variety = request.args.get('variety', '')
+        state = request.args.get('state', '').replace('-', ' ')
+        district = request.args.get('district', '').replace('-', ' ')
+        market = request.args.get('market', '')
+        k = min(max(request.args.get('k', 10, type=int), 1), 100)
+
+        if not crop:
+            return jsonify({'success': False, 'error': 'crop is required'}), 400
+
+        today = datetime.now().strftime('%Y_%m_%d')
+        path = f'daily_market_data/market_data_{today}.json'
+
+        if not os.path.exists(path):
+            return jsonify({'success': False, 'error': 'Market data not ready'}), 404
+
+        engine = load_spread_engine(path)
+        variety_key = engine.resolve_variety(crop, variety)
+        if variety_key is None:
+            varieties = engine.varieties_for(crop)
+            if varieties and not variety:
+                return jsonify({'success': False, 'error': 'variety is required', 'varieties': varieties}), 400
+            return jsonify({'success': False, 'error': 'No data found'}), 404
+
+        result = {
+            'commodity': crop,
+            'variety': variety_key,
+            'totalMarkets': engine.market_count(crop, variety_key),
+            'topMarkets': engine.top_k(crop, variety_key, k),
+            'lastUpdated': datetime.now().isoformat()
+        }
+
+        if state:
+            result['stateBest'] = engine.best_in_state(crop, variety_key, state)
+        if state and district:
+            result['districtSpread'] = engine.spread(crop, variety_key, state, district)
+        if state and district and market:
+            row = engine.market(crop, variety_key, state, district, market)
+            if row:
+                result['market'] = dict(row, percentile=engine.percentile(crop, variety_key, row['price']))
+
+        return jsonify({'success': True, 'data': result})
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # -------------------------------------------------
 # Server start
 # -------------------------------------------------
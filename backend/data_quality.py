@@ -0,0 +1,89 @@
+"""
+Anomaly and outlier flagging for daily market records.
+
+Each record gets a ``flagged`` boolean and a ``flagReason`` string so the API
+can drop bad rows from aggregates without re-running any checks.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+GROUP_KEYS = ['commodity', 'variety', 'state']
+MARKET_KEYS = ['state', 'district', 'market', 'commodity', 'variety']
+DUPLICATE_KEYS = MARKET_KEYS + ['price', 'quantity']
+
+# Prices are compared on a log10 scale: 1.0 means a 10x gap.
+MAX_LOG_RATIO = 1.0
+ROBUST_Z_THRESHOLD = 3.5
+MIN_LOG_MAD = 0.1
+MIN_GROUP_SIZE = 5
+
+
+def _log_price(prices: pd.Series) -> pd.Series:
+    return np.log10(prices.where(prices > 0))
+
+
+def _previous_prices(df: pd.DataFrame, previous: Optional[List[Dict[str, Any]]]) -> pd.Series:
+    """Previous day's median price per market, aligned to the rows of ``df``"""
+    if not previous:
+        return pd.Series(np.nan, index=df.index)
+    prev = pd.DataFrame(previous)
+    if 'flagged' in prev:
+        prev = prev[~prev['flagged'].fillna(False).astype(bool)]
+    prev = prev.groupby(MARKET_KEYS, sort=False)['price'].median().rename('previousPrice')
+    merged = df[MARKET_KEYS].merge(prev, how='left', left_on=MARKET_KEYS, right_index=True)
+    return merged['previousPrice']
+
+
+def flag_anomalies(records: List[Dict[str, Any]],
+                   previous: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Flag invalid prices, duplicates and price outliers in one day's records.
+
+    Outliers are judged against the robust (median/MAD) spread of the day's
+    (commodity, variety, state) group and against the same market's price in
+    ``previous``, the prior day's records.
+    """
+    if not records:
+        return records
+
+    df = pd.DataFrame(records)
+    price = pd.to_numeric(df['price'], errors='coerce')
+    quantity = pd.to_numeric(df['quantity'], errors='coerce').fillna(0)
+
+    invalid = price.isna() | (price <= 0) | (quantity < 0)
+    duplicate = df.duplicated(subset=DUPLICATE_KEYS, keep='first')
+
+    log_price = _log_price(price)
+    groups = log_price.groupby([df[k] for k in GROUP_KEYS], sort=False)
+    median = groups.transform('median')
+    deviation = (log_price - median).abs()
+    mad = deviation.groupby([df[k] for k in GROUP_KEYS], sort=False).transform('median')
+    size = groups.transform('count')
+    robust_z = 0.6745 * deviation / mad.clip(lower=MIN_LOG_MAD)
+    group_outlier = (deviation >= MAX_LOG_RATIO) | ((size >= MIN_GROUP_SIZE) & (robust_z > ROBUST_Z_THRESHOLD))
+
+    previous_log = _log_price(_previous_prices(df, previous))
+    day_over_day = ((log_price - previous_log).abs() >= MAX_LOG_RATIO).fillna(False)
+
+    reason = np.select(
+        [invalid, duplicate, group_outlier, day_over_day],
+        ['invalid_value', 'duplicate', 'price_outlier', 'day_over_day_jump'],
+        default=''
+    )
+
+    for rec, r in zip(records, reason.tolist()):
+        rec['flagged'] = bool(r)
+        rec['flagReason'] = r
+
+    flagged = int((reason != '').sum())
+    if flagged:
+        print(f"Flagged {flagged} of {len(records)} records as anomalies")
+    return records
+
+
+def clean_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows of a stored snapshot that were not flagged"""
+    if 'flagged' not in df:
+        return df
+    return df[~df['flagged'].fillna(False).astype(bool)]
@@ -5,6 +5,8 @@ import os
 import pandas as pd
 import json
 
+from data_quality import flag_anomalies
+
 API_KEY = '579b464db66ec23bdd0000011f39e117c7784e335a1cd1d7897779de' # Replace with your actual key
 
 API_ENDPOINTS = [
@@ -113,6 +115,14 @@ def delete_old_json_files():
             except (ValueError, FileNotFoundError) as e:
                 print(f"Warning: Could not process or delete file {filename}: {e}")
 
+def load_daily_json(date):
+    """Loads the stored records for a specific day, or None if not retained."""
+    file_path = os.path.join(DATA_FOLDER, f"market_data_{date.strftime('%Y_%m_%d')}.json")
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path) as f:
+        return json.load(f)
+
 def run_data_pipeline():
     """Main function to run the entire data pipeline."""
     api_key = API_KEY
@@ -123,15 +133,19 @@ def run_data_pipeline():
     delete_old_json_files()
     
     today = datetime.now().date()
-    for i in range(7):
+    # Oldest day first so each day is checked against the one before it.
+    previous_data = load_daily_json(today - timedelta(days=7))
+    for i in range(6, -1, -1):
         date_to_fetch = today - timedelta(days=i)
         all_records = []
         for url in API_ENDPOINTS:
             records = fetch_records(url, api_key, date=date_to_fetch)
             all_records.extend(records)
         
-        processed_data = process_records(all_records)
+        processed_data = flag_anomalies(process_records(all_records), previous_data)
         store_daily_json(processed_data, date_to_fetch)
+        if processed_data:
+            previous_data = processed_data
 
 if __name__ == '__main__':
     run_data_pipeline()
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Cross-market price spread engine.
+
+Prices for each (commodity, variety) are sorted once per daily snapshot so
+top-K, percentile and district/state spread queries are answered from the
+precomputed arrays with binary search instead of rescanning every row.
+"""
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_quality import clean_rows
+
+
+SNAPSHOT_COLUMNS = ['state', 'district', 'market', 'commodity', 'variety', 'price', 'quantity']
+
+
+def _key(value) -> str:
+    return str(value or '').strip().lower()
+
+
+class PriceSpreadEngine:
+    """Sorted per-(commodity, variety) price index, one entry per market"""
+
+    def __init__(self, df: pd.DataFrame):
+        # An empty snapshot ("[]") has no columns; index it as zero rows.
+        if df.empty:
+            df = pd.DataFrame({col: pd.Series(dtype=float if col in ('price', 'quantity') else object)
+                               for col in SNAPSHOT_COLUMNS})
+        df = clean_rows(df)
+        df = df[df['price'] > 0].copy()
+        for col in ('commodity', 'variety', 'state', 'district', 'market'):
+            df[col] = df[col].fillna('').astype(str)
+            df[f'_{col}'] = df[col].map(_key)
+
+        # One global sort: rows of each (commodity, variety) group become a
+        # contiguous slice ordered by ascending price. Markets reporting
+        # several rows (e.g. grades) keep only their best price.
+        df = df.sort_values(['_commodity', '_variety', 'price'], kind='mergesort')
+        df = df.drop_duplicates(subset=['_commodity', '_variety', '_state', '_district', '_market'], keep='last')
+        df = df.reset_index(drop=True)
+
+        self.prices = df['price'].to_numpy(dtype=float)
+        self.rows = df[['state', 'district', 'market', 'price', 'quantity']].to_dict('records')
+
+        self.groups: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        self.varieties: Dict[str, List[str]] = {}
+        group_keys = list(zip(df['_commodity'], df['_variety']))
+        start = 0
+        for i in range(1, len(group_keys) + 1):
+            if i == len(group_keys) or group_keys[i] != group_keys[start]:
+                self.groups[group_keys[start]] = (start, i)
+                self.varieties.setdefault(group_keys[start][0], []).append(df.at[start, 'variety'])
+                start = i
+
+        # Sorted ascending, so the last row seen per key is the best price.
+        self.state_best: Dict[Tuple[str, str, str], int] = {}
+        self.district_best: Dict[Tuple[str, str, str, str], int] = {}
+        self.market_row: Dict[Tuple[str, str, str, str, str], int] = {}
+        for i, (c, v, s, d, m) in enumerate(zip(df['_commodity'], df['_variety'], df['_state'],
+                                                df['_district'], df['_market'])):
+            self.state_best[(c, v, s)] = i
+            self.district_best[(c, v, s, d)] = i
+            self.market_row[(c, v, s, d, m)] = i
+
+    def resolve_variety(self, commodity: str, variety: str = None) -> Optional[str]:
+        """Return the variety key to use, or None if it is missing or ambiguous"""
+        commodity = _key(commodity)
+        if variety:
+            return _key(variety) if (commodity, _key(variety)) in self.groups else None
+        varieties = self.varieties.get(commodity, [])
+        return _key(varieties[0]) if len(varieties) == 1 else None
+
+    def varieties_for(self, commodity: str) -> List[str]:
+        """Varieties quoted for ``commodity`` in this snapshot"""
+        return self.varieties.get(_key(commodity), [])
+
+    def top_k(self, commodity: str, variety: str, k: int = 10) -> List[Dict[str, Any]]:
+        """Markets with the highest price, best first"""
+        start, end = self.groups[(_key(commodity), _key(variety))]
+        first = max(start, end - k)
+        return [self.rows[i] for i in range(end - 1, first - 1, -1)]
+
+    def percentile(self, commodity: str, variety: str, price: float) -> float:
+        """Share of markets (0-100) whose price is at or below ``price``"""
+        start, end = self.groups[(_key(commodity), _key(variety))]
+        rank = np.searchsorted(self.prices[start:end], price, side='right')
+        return round(100.0 * rank / (end - start), 2)
+
+    def market_count(self, commodity: str, variety: str) -> int:
+        start, end = self.groups[(_key(commodity), _key(variety))]
+        return end - start
+
+    def best_in_state(self, commodity: str, variety: str, state: str) -> Optional[Dict[str, Any]]:
+        i = self.state_best.get((_key(commodity), _key(variety), _key(state)))
+        return None if i is None else self.rows[i]
+
+    def best_in_district(self, commodity: str, variety: str, state: str, district: str) -> Optional[Dict[str, Any]]:
+        i = self.district_best.get((_key(commodity), _key(variety), _key(state), _key(district)))
+        return None if i is None else self.rows[i]
+
+    def market(self, commodity: str, variety: str, state: str, district: str, market: str) -> Optional[Dict[str, Any]]:
+        i = self.market_row.get((_key(commodity), _key(variety), _key(state), _key(district), _key(market)))
+        return None if i is None else self.rows[i]
+
+    def spread(self, commodity: str, variety: str, state: str, district: str) -> Optional[Dict[str, Any]]:
+        """Gap between the district's best price and the best price in its state"""
+        state_row = self.best_in_state(commodity, variety, state)
+        district_row = self.best_in_district(commodity, variety, state, district)
+        if state_row is None or district_row is None:
+            return None
+        spread = state_row['price'] - district_row['price']
+        return {
+            'stateBest': state_row,
+            'districtBest': district_row,
+            'spread': round(spread, 2),
+            'spreadPercent': round(100.0 * spread / district_row['price'], 2)
+        }
+
+
+_engine_cache: Dict[str, Tuple[float, PriceSpreadEngine]] = {}
+_engine_lock = threading.Lock()
+
+
+def load_spread_engine(path: str) -> PriceSpreadEngine:
+    """Build the engine for a snapshot file, reusing it until the file changes"""
+    mtime = os.path.getmtime(path)
+    with _engine_lock:
+        cached = _engine_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    engine = PriceSpreadEngine(pd.read_json(path))
+    with _engine_lock:
+        _engine_cache.clear()
+        _engine_cache[path] = (mtime, engine)
+    return engine
@@ -0,0 +1,200 @@
+"""
+User profile store with a bounded TTL cache in front of the backing database.
+
+Firestore is used when Firebase is configured; otherwise profiles are kept in a
+local SQLite file so they survive restarts and are shared between workers.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+USER_DB_PATH = os.getenv('USER_DB_PATH', 'users.db')
+CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', '10000'))
+CACHE_TTL_SECONDS = int(os.getenv('USER_CACHE_TTL_SECONDS', '300'))
+
+
+class UserExistsError(Exception):
+    """Raised when registering an email that already has a profile"""
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: int = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteUserStore:
+    """Local persistent user store with a unique index on email"""
+
+    def __init__(self, path: str = USER_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS users ('
+            ' uid TEXT PRIMARY KEY,'
+            ' email TEXT NOT NULL UNIQUE,'
+            ' password_hash TEXT,'
+            ' profile TEXT NOT NULL)'
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def _fetch(self, column: str, value: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            f'SELECT profile, password_hash FROM users WHERE {column} = ?', (value,)
+        ).fetchone()
+        if row is None:
+            return None
+        profile = json.loads(row[0])
+        profile['_password_hash'] = row[1]
+        return profile
+
+    def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return self._fetch('email', email)
+
+    def get_by_uid(self, uid: str) -> Optional[Dict[str, Any]]:
+        return self._fetch('uid', uid)
+
+    def create(self, profile: Dict[str, Any], password: str) -> Dict[str, Any]:
+        profile = dict(profile)
+        profile['uid'] = profile.get('uid') or f"user_{uuid.uuid4().hex[:12]}"
+        password_hash = generate_password_hash(password) if password else None
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO users (uid, email, password_hash, profile) VALUES (?, ?, ?, ?)',
+                    (profile['uid'], profile['email'], password_hash, json.dumps(profile, default=str))
+                )
+        except sqlite3.IntegrityError as e:
+            if 'UNIQUE' not in str(e):
+                raise
+            raise UserExistsError(profile['email'])
+        profile['_password_hash'] = password_hash
+        return profile
+
+
+class FirestoreUserStore:
+    """Firestore-backed user store using an email -> uid lookup collection"""
+
+    def __init__(self, db, users_collection: str = 'users', email_collection: str = 'user_emails'):
+        self.users = db.collection(users_collection)
+        self.emails = db.collection(email_collection)
+
+    def get_by_uid(self, uid: str) -> Optional[Dict[str, Any]]:
+        doc = self.users.document(uid).get()
+        return doc.to_dict() if doc.exists else None
+
+    def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        index = self.emails.document(email).get()
+        if index.exists:
+            return self.get_by_uid(index.to_dict()['uid'])
+
+        # Profiles created before the lookup collection existed: query once
+        # and backfill the index so later logins are a direct document read.
+        docs = self.users.where('email', '==', email).limit(1).get()
+        if not docs:
+            return None
+        profile = docs[0].to_dict()
+        self.emails.document(email).set({'uid': profile['uid']})
+        return profile
+
+    def create(self, profile: Dict[str, Any], password: str = None) -> Dict[str, Any]:
+        self.users.document(profile['uid']).set(profile)
+        self.emails.document(profile['email']).set({'uid': profile['uid']})
+        return profile
+
+
+class CachedUserStore:
+    """Read-through, write-through cache keyed by both email and uid"""
+
+    def __init__(self, backend, cache: TTLCache = None):
+        self.backend = backend
+        self.cache = cache or TTLCache()
+
+    def _remember(self, profile: Dict[str, Any]):
+        self.cache.set(f"email:{profile['email']}", profile)
+        self.cache.set(f"uid:{profile['uid']}", profile)
+
+    def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        profile = self.cache.get(f"email:{email}")
+        if profile is None:
+            profile = self.backend.get_by_email(email)
+            if profile is not None:
+                self._remember(profile)
+        return profile
+
+    def get_by_uid(self, uid: str) -> Optional[Dict[str, Any]]:
+        profile = self.cache.get(f"uid:{uid}")
+        if profile is None:
+            profile = self.backend.get_by_uid(uid)
+            if profile is not None:
+                self._remember(profile)
+        return profile
+
+    def create(self, profile: Dict[str, Any], password: str = None) -> Dict[str, Any]:
+        profile = self.backend.create(profile, password)
+        self._remember(profile)
+        return profile
+
+    def check_password(self, profile: Dict[str, Any], password: str) -> bool:
+        password_hash = profile.get('_password_hash')
+        return bool(password_hash and password and check_password_hash(password_hash, password))
+
+
+def public_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Strip store-internal fields before returning a profile to the client"""
+    return {k: v for k, v in profile.items() if not k.startswith('_')}
+
+
+def create_user_store(db=None) -> CachedUserStore:
+    """Build the cached store for Firestore if a client is given, else SQLite"""
+    if db is not None:
+        return CachedUserStore(FirestoreUserStore(db))
+    return CachedUserStore(SQLiteUserStore())
@@ -144,10 +144,12 @@ class MarketDataManager {
 
     // Update the summary cards with new data
     updateSummaryStats(data) {
-        const totalVolume = data.reduce((sum, item) => sum + (item.totalVolume || 0), 0);
-        const totalPrice = data.reduce((sum, item) => sum + (item.price || 0), 0);
-        const averagePrice = data.length > 0 ? (totalPrice / data.length / 100) : 0;
-        const topCommodity = data.length > 0 ? data.reduce((a, b) => (a.totalVolume || 0) > (b.totalVolume || 0) ? a : b).commodity : 'N/A';
+        // Rows flagged as anomalies by the pipeline stay in the table but not in the stats
+        const cleanData = data.filter(item => !item.flagged);
+        const totalVolume = cleanData.reduce((sum, item) => sum + (item.totalVolume || 0), 0);
+        const totalPrice = cleanData.reduce((sum, item) => sum + (item.price || 0), 0);
+        const averagePrice = cleanData.length > 0 ? (totalPrice / cleanData.length / 100) : 0;
+        const topCommodity = cleanData.length > 0 ? cleanData.reduce((a, b) => (a.totalVolume || 0) > (b.totalVolume || 0) ? a : b).commodity : 'N/A';
 
         this.dom.summary.activeMarkets.textContent = data.length || 0;
         this.dom.summary.avgPrice.textContent = `₹${averagePrice.toLocaleString('en-IN')}/KG`;